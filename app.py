@@ -1,12 +1,150 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import os
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import faiss
+
+# Leave half the cores for request threads instead of one torch pool using all of them
+# (read by rag_pipeline at import)
+os.environ.setdefault("RAG_THREADS", str(max(1, (os.cpu_count() or 2) // 2)))
+
 from rag_pipeline import RAGPipeline
-from llm_generator import LLMGenerator
+from llm_generator import LLMGenerator, LLMError
 
 app = Flask(__name__)
 CORS(app)
 
+
+class EmbedBatcher:
+    """
+    Coalesce query encoding from concurrent requests into batched encode calls.
+    
+    Requests arriving within max_wait_ms of each other (up to max_batch) share
+    a single forward pass of the embedding model.
+    """
+    
+    def __init__(self, rag: RAGPipeline, max_batch: int = 32, max_wait_ms: float = 8):
+        self.rag = rag
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def encode(self, query: str) -> np.ndarray:
+        """Queue a query and block until its normalized (1, dim) embedding is ready."""
+        self._ensure_worker()
+        
+        done = threading.Event()
+        slot = {}
+        self.queue.put((query, done, slot))
+        done.wait()
+        
+        if 'error' in slot:
+            raise slot['error']
+        return slot['result']
+    
+    def _ensure_worker(self):
+        # Started lazily so the thread lives in the process that serves requests
+        # (threads do not survive a fork, e.g. gunicorn with preload_app)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            self._process(batch)
+    
+    def _process(self, batch):
+        try:
+            query_embeddings = self.rag.encode_queries([item[0] for item in batch])
+            
+            for i, (_, _, slot) in enumerate(batch):
+                slot['result'] = query_embeddings[i:i+1]
+        except Exception as e:
+            for _, _, slot in batch:
+                slot['error'] = e
+        finally:
+            for _, done, _ in batch:
+                done.set()
+
+
+class QueryCache:
+    """
+    Two-tier cache of generated answers.
+    
+    Exact repeats of a (query, top_k) pair are served from an LRU dict. Other
+    queries are compared against the embeddings of previously answered ones
+    (a single shared FAISS index) and reuse an answer when the cosine
+    similarity exceeds the threshold.
+    """
+    
+    def __init__(self, embedding_dim: int, maxsize: int = 1024, threshold: float = 0.97):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.exact = OrderedDict()
+        self.semantic_index = faiss.IndexFlatIP(embedding_dim)
+        self.semantic_entries = []  # (top_k, result), in index order
+        self._lock = threading.Lock()
+    
+    def get_exact(self, query: str, top_k: int):
+        """Return the cached result for this exact query, or None."""
+        with self._lock:
+            result = self.exact.get((query, top_k))
+            if result is not None:
+                self.exact.move_to_end((query, top_k))
+            return result
+    
+    def get_similar(self, query_embedding: np.ndarray, top_k: int):
+        """Return the cached result of a near-identical query, or None."""
+        with self._lock:
+            if self.semantic_index.ntotal == 0:
+                return None
+            
+            # A few neighbours, since the closest one may have used another top_k
+            scores, indices = self.semantic_index.search(query_embedding, min(8, self.semantic_index.ntotal))
+            for score, idx in zip(scores[0], indices[0]):
+                if score < self.threshold:
+                    break
+                cached_top_k, result = self.semantic_entries[idx]
+                if cached_top_k == top_k:
+                    return result
+            return None
+    
+    def put(self, query: str, top_k: int, query_embedding: np.ndarray, result: dict):
+        """Cache a successfully generated result."""
+        with self._lock:
+            self.exact[(query, top_k)] = result
+            self.exact.move_to_end((query, top_k))
+            if len(self.exact) > self.maxsize:
+                self.exact.popitem(last=False)
+            
+            self.semantic_index.add(query_embedding)
+            self.semantic_entries.append((top_k, result))
+            if self.semantic_index.ntotal > self.maxsize:
+                # Evict the oldest entry
+                self.semantic_index.remove_ids(np.array([0], dtype=np.int64))
+                self.semantic_entries.pop(0)
+
+
 # Initialize RAG pipeline and LLM generator
 print("Initializing RAG system...")
 rag = RAGPipeline()
@@ -16,14 +154,35 @@ llm = LLMGenerator()
 if not rag.load_index():
     print("Building new index from documents...")
     rag.process_documents()
-    if len(rag.chunks) > 0:
+    if len(rag.texts) > 0:
         rag.save_index()
     else:
         print("Warning: No documents found to index")
 
+batcher = EmbedBatcher(rag)
+cache = QueryCache(rag.embedding_dim)
+
 print("RAG system ready!")
 
 
+def lookup_cache(user_query: str, top_k: int):
+    """
+    Look up a cached answer for a query.
+    
+    The query is encoded at most once; on a miss the returned embedding is
+    reused for corpus retrieval.
+    
+    Returns:
+        (cached result or None, query embedding or None on an exact hit)
+    """
+    result = cache.get_exact(user_query, top_k)
+    if result is not None:
+        return result, None
+    
+    query_embedding = batcher.encode(user_query)
+    return cache.get_similar(query_embedding, top_k), query_embedding
+
+
 @app.route('/')
 def home():
     """Render the main chat interface."""
@@ -61,11 +220,17 @@ def query():
         if not user_query:
             return jsonify({'error': 'Query cannot be empty'}), 400
         
-        # Retrieve relevant chunks
-        retrieved_chunks = rag.retrieve(user_query, top_k=top_k)
+        result, query_embedding = lookup_cache(user_query, top_k)
         
-        # Generate answer
-        result = llm.generate_answer(user_query, retrieved_chunks)
+        if result is None:
+            # Retrieve relevant chunks
+            retrieved_chunks = rag.retrieve_precomputed(query_embedding, top_k=top_k)
+            
+            # Generate answer
+            result = llm.generate_answer(user_query, retrieved_chunks)
+            
+            if not result['error']:
+                cache.put(user_query, top_k, query_embedding, result)
         
         # Format response
         response = {
@@ -89,12 +254,97 @@ def query():
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
 
+@app.route('/api/query/stream', methods=['POST'])
+def query_stream():
+    """
+    Handle user queries and stream the answer as Server-Sent Events.
+    
+    Expected JSON payload: same as /api/query
+    
+    Streams events (each a "data:" line with a JSON object):
+        {"type": "context", "context": [list of retrieved chunks]}
+        {"type": "token", "text": "answer fragment"}   (repeated)
+        {"type": "done", "grounded": true/false}
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or 'query' not in data:
+            return jsonify({'error': 'Missing query parameter'}), 400
+        
+        user_query = data['query'].strip()
+        top_k = data.get('top_k', 3)
+        
+        if not user_query:
+            return jsonify({'error': 'Query cannot be empty'}), 400
+    
+    except Exception as e:
+        print(f"Error processing query: {str(e)}")
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+    
+    def sse(event):
+        return f"data: {json.dumps(event)}\n\n"
+    
+    def context_event(chunks):
+        return sse({
+            'type': 'context',
+            'context': [
+                {
+                    'text': chunk['text'],
+                    'source': chunk['source'],
+                    'score': chunk['score']
+                }
+                for chunk in chunks
+            ]
+        })
+    
+    def generate():
+        try:
+            result, query_embedding = lookup_cache(user_query, top_k)
+            
+            if result is not None:
+                yield context_event(result['context_used'])
+                yield sse({'type': 'token', 'text': result['answer']})
+                yield sse({'type': 'done', 'grounded': result['grounded']})
+                return
+            
+            retrieved_chunks = rag.retrieve_precomputed(query_embedding, top_k=top_k)
+            yield context_event(retrieved_chunks)
+            
+            answer_parts = []
+            try:
+                for text in llm.generate_answer_stream(user_query, retrieved_chunks):
+                    answer_parts.append(text)
+                    yield sse({'type': 'token', 'text': text})
+            except LLMError as e:
+                yield sse({'type': 'token', 'text': str(e)})
+            else:
+                cache.put(user_query, top_k, query_embedding, {
+                    'answer': ''.join(answer_parts).strip(),
+                    'context_used': retrieved_chunks,
+                    'grounded': bool(retrieved_chunks),
+                    'error': False
+                })
+            
+            yield sse({'type': 'done', 'grounded': bool(retrieved_chunks)})
+        
+        except Exception as e:
+            print(f"Error processing query: {str(e)}")
+            yield sse({'type': 'error', 'error': f'Internal server error: {str(e)}'})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint."""
     return jsonify({
         'status': 'healthy',
-        'documents_indexed': len(rag.chunks),
+        'documents_indexed': len(rag.texts),
         'index_ready': rag.index is not None
     })
 
@@ -103,7 +353,7 @@ def health():
 def stats():
     """Get system statistics."""
     return jsonify({
-        'total_chunks': len(rag.chunks),
+        'total_chunks': len(rag.texts),
         'embedding_dimension': rag.embedding_dim,
         'model': 'all-MiniLM-L6-v2'
     })
@@ -0,0 +1,34 @@
+"""
+Script to export the embedding model to a quantized ONNX model for faster CPU inference
+
+Requires: pip install optimum[onnxruntime]
+"""
+import json
+import os
+
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+
+
+def export_model(model_id="sentence-transformers/all-MiniLM-L6-v2", save_dir="onnx_minilm"):
+    """Export the model to ONNX and apply dynamic INT8 quantization"""
+    print(f"Exporting {model_id} to ONNX...")
+    model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+    model.save_pretrained(save_dir)
+    AutoTokenizer.from_pretrained(model_id).save_pretrained(save_dir)
+    
+    print("Quantizing to INT8...")
+    quantizer = ORTQuantizer.from_pretrained(model)
+    qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=save_dir, quantization_config=qconfig)
+    
+    # Record the source model so RAGPipeline only uses this export for it
+    with open(os.path.join(save_dir, "source_model.json"), "w") as f:
+        json.dump({"model_id": model_id}, f)
+    
+    print(f"\n✅ Quantized model saved to {save_dir}/model_quantized.onnx")
+
+
+if __name__ == "__main__":
+    export_model()
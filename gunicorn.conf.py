@@ -0,0 +1,14 @@
+"""
+Gunicorn configuration: gunicorn -c gunicorn.conf.py app:app
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# A single worker holds one copy of the embedding model and FAISS index;
+# threads let concurrent /api/query requests share EmbedBatcher batches
+# and overlap Ollama waits with FAISS/torch calls (which release the GIL).
+# gevent is not used: it ignores threads and cannot overlap those C calls.
+workers = 1
+worker_class = "gthread"
+threads = 32  # keep in sync with LLMGenerator._POOL_SIZE
@@ -1,26 +1,74 @@
 import os
+import json
 import requests
-from typing import List, Dict
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Iterator
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+class LLMError(Exception):
+    """Raised when the LLM call fails; the message is suitable to show the user."""
+
+
 class LLMGenerator:
-    def __init__(self, api_key: str = None):
+    # Fixed attribute set: the API key is read from the environment once in
+    # __init__ and stored here
+    __slots__ = ('api_key', 'keep_alive', 'max_ctx_tokens', 'ollama_options', 'base_url',
+                 'use_ollama_format', 'site_url', 'app_name', 'session')
+
+    # Static parts of the grounded prompt (see _create_grounded_prompt)
+    _PROMPT_PREFIX = """You are a helpful assistant for a construction marketplace. Your job is to answer questions using ONLY the information provided in the context below.
+
+IMPORTANT RULES:
+1. Answer ONLY based on the provided context
+2. If the context doesn't contain enough information, say "I don't have enough information in the documents to answer this question"
+3. Do NOT use your general knowledge
+4. Quote or reference specific parts of the context when possible
+5. Be concise and direct
+
+CONTEXT:
+"""
+    _PROMPT_MIDDLE = """
+
+QUESTION:
+"""
+    _PROMPT_SUFFIX = """
+
+ANSWER:"""
+
+    # Rough token estimate used to budget the context without a tokenizer
+    _CHARS_PER_TOKEN = 4
+
+    # One pooled connection per request thread (threads in gunicorn.conf.py)
+    _POOL_SIZE = 32
+
+    def __init__(self, api_key: str = None, keep_alive: str = "10m", max_ctx_tokens: int = 1200):
         """
         Initialize LLM Generator with Ollama API.
         
         Args:
             api_key: Ollama API key
+            keep_alive: How long Ollama keeps the model loaded after a request
+            max_ctx_tokens: Approximate token budget for retrieved context in the prompt
         """
         self.api_key = api_key or os.getenv("OLLAMA_API_KEY")
+        self.keep_alive = keep_alive
+        self.max_ctx_tokens = max_ctx_tokens
+        # Cap answer length and the KV cache Ollama allocates for the prompt
+        self.ollama_options = {"num_predict": 256, "num_ctx": 2048}
         # Use Ollama's generate endpoint which is more reliable
         self.base_url = "http://localhost:11434/api/generate"
         self.use_ollama_format = True
         self.site_url = "http://localhost:5000"
         self.app_name = "Construction RAG System"
         
+        # Reuse keep-alive connections to Ollama across requests and threads
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=self._POOL_SIZE, max_retries=0))
+        self.session.headers.update({"Connection": "keep-alive"})
+        
     def generate_answer(self, query: str, retrieved_chunks: List[Dict]) -> Dict:
         """
         Generate answer using LLM based on retrieved chunks.
@@ -30,33 +78,65 @@ class LLMGenerator:
             retrieved_chunks: List of retrieved document chunks
             
         Returns:
-            Dictionary with answer and metadata
+            Dictionary with answer and metadata ('error' is True if the LLM
+            call failed and 'answer' holds the error message)
         """
         if not retrieved_chunks:
             return {
                 'answer': "I couldn't find relevant information in the documents to answer your question.",
                 'context_used': [],
-                'grounded': False
+                'grounded': False,
+                'error': False
             }
         
-        # Build context from retrieved chunks
-        context = "\n\n".join([
-            f"[Source: {chunk['source']}]\n{chunk['text']}"
-            for chunk in retrieved_chunks
-        ])
-        
         # Create prompt that enforces grounding
-        prompt = self._create_grounded_prompt(query, context)
+        prompt = self._create_grounded_prompt(query, self._build_context(retrieved_chunks))
         
         # Generate answer
-        answer = self._call_llm(prompt)
+        try:
+            answer = self._call_llm(prompt)
+            error = False
+        except LLMError as e:
+            answer = str(e)
+            error = True
         
         return {
             'answer': answer,
             'context_used': retrieved_chunks,
-            'grounded': True
+            'grounded': True,
+            'error': error
         }
     
+    def generate_answer_stream(self, query: str, retrieved_chunks: List[Dict]) -> Iterator[str]:
+        """
+        Generate answer like generate_answer, yielding text as the LLM produces it.
+        
+        Args:
+            query: User query
+            retrieved_chunks: List of retrieved document chunks
+            
+        Yields:
+            Pieces of the answer text
+            
+        Raises:
+            LLMError: If the LLM call fails (possibly after some text was yielded)
+        """
+        if not retrieved_chunks:
+            yield "I couldn't find relevant information in the documents to answer your question."
+            return
+        
+        prompt = self._create_grounded_prompt(query, self._build_context(retrieved_chunks))
+        yield from self._stream_llm(prompt)
+    
+    def _build_context(self, retrieved_chunks: List[Dict]) -> str:
+        """Build the prompt context from retrieved chunks, trimmed to max_ctx_tokens."""
+        # Share the budget equally between chunks
+        max_chars = self.max_ctx_tokens * self._CHARS_PER_TOKEN // len(retrieved_chunks)
+        return "\n\n".join(
+            "[Source: " + chunk['source'] + "]\n" + chunk['text'][:max_chars]
+            for chunk in retrieved_chunks
+        )
+    
     def _create_grounded_prompt(self, query: str, context: str) -> str:
         """
         Create a prompt that enforces grounding to retrieved context.
@@ -68,24 +148,7 @@ class LLMGenerator:
         Returns:
             Formatted prompt
         """
-        prompt = f"""You are a helpful assistant for a construction marketplace. Your job is to answer questions using ONLY the information provided in the context below.
-
-IMPORTANT RULES:
-1. Answer ONLY based on the provided context
-2. If the context doesn't contain enough information, say "I don't have enough information in the documents to answer this question"
-3. Do NOT use your general knowledge
-4. Quote or reference specific parts of the context when possible
-5. Be concise and direct
-
-CONTEXT:
-{context}
-
-QUESTION:
-{query}
-
-ANSWER:"""
-        
-        return prompt
+        return self._PROMPT_PREFIX + context + self._PROMPT_MIDDLE + query + self._PROMPT_SUFFIX
     
     def _call_llm(self, prompt: str, model: str = "llama3.1") -> str:
         """
@@ -97,9 +160,12 @@ ANSWER:"""
             
         Returns:
             Generated answer text
+            
+        Raises:
+            LLMError: If the API call fails
         """
         if not self.api_key:
-            return "Error: Ollama API key not configured. Please set OLLAMA_API_KEY in .env file"
+            raise LLMError("Error: Ollama API key not configured. Please set OLLAMA_API_KEY in .env file")
         
         # Ollama generate format (simpler and more reliable)
         headers = {
@@ -109,11 +175,13 @@ ANSWER:"""
         payload = {
             "model": model,
             "prompt": prompt,
-            "stream": False
+            "stream": False,
+            "keep_alive": self.keep_alive,
+            "options": self.ollama_options
         }
         
         try:
-            response = requests.post(
+            response = self.session.post(
                 self.base_url,
                 headers=headers,
                 json=payload,
@@ -124,7 +192,7 @@ ANSWER:"""
             
             # Check if response has content
             if not response.text:
-                return "Error: Empty response from API"
+                raise LLMError("Error: Empty response from API")
             
             result = response.json()
             
@@ -135,19 +203,75 @@ ANSWER:"""
             # Check for error
             if 'error' in result:
                 error_msg = result.get('error', 'Unknown error')
-                return f"API Error: {error_msg}"
+                raise LLMError(f"API Error: {error_msg}")
             
-            return f"Error: Unexpected API response format: {result}"
+            raise LLMError(f"Error: Unexpected API response format: {result}")
             
         except requests.exceptions.HTTPError as e:
-            return f"HTTP Error {response.status_code}: {response.text[:200]}"
+            raise LLMError(f"HTTP Error {response.status_code}: {response.text[:200]}")
         except requests.exceptions.RequestException as e:
             # If local Ollama fails, return helpful message
-            return f"⚠️ Cannot connect to Ollama. Make sure Ollama is running locally on http://localhost:11434 or check your API key."
+            raise LLMError(f"⚠️ Cannot connect to Ollama. Make sure Ollama is running locally on http://localhost:11434 or check your API key.")
         except ValueError as e:
-            return f"Error parsing JSON response: {str(e)}"
+            raise LLMError(f"Error parsing JSON response: {str(e)}")
         except (KeyError, IndexError) as e:
-            return f"Error parsing LLM response structure: {str(e)}"
+            raise LLMError(f"Error parsing LLM response structure: {str(e)}")
+    
+    def _stream_llm(self, prompt: str, model: str = "llama3.1") -> Iterator[str]:
+        """
+        Call Ollama API with streaming enabled.
+        
+        Args:
+            prompt: Full prompt with context and query
+            model: Model to use (default: llama3.1)
+            
+        Yields:
+            Response text fragments as they are generated
+            
+        Raises:
+            LLMError: If the API call fails
+        """
+        if not self.api_key:
+            raise LLMError("Error: Ollama API key not configured. Please set OLLAMA_API_KEY in .env file")
+        
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+            "options": self.ollama_options
+        }
+        
+        try:
+            with self.session.post(
+                self.base_url,
+                headers={"Content-Type": "application/json"},
+                json=payload,
+                stream=True,
+                timeout=120
+            ) as response:
+                # Read the error body while the streamed response is still open
+                if not response.ok:
+                    raise LLMError(f"HTTP Error {response.status_code}: {response.text[:200]}")
+                
+                # Ollama streams one JSON object per line
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    
+                    result = json.loads(line)
+                    if 'error' in result:
+                        raise LLMError(f"API Error: {result['error']}")
+                    
+                    if result.get('response'):
+                        yield result['response']
+                    if result.get('done'):
+                        return
+        
+        except requests.exceptions.RequestException:
+            raise LLMError("⚠️ Cannot connect to Ollama. Make sure Ollama is running locally on http://localhost:11434 or check your API key.")
+        except ValueError as e:
+            raise LLMError(f"Error parsing JSON response: {str(e)}")
 
 
 if __name__ == "__main__":
@@ -1,15 +1,184 @@
 import os
+import re
+import json
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import faiss
-import pickle
-from typing import List, Dict, Tuple
+import torch
+from typing import List, Dict, Tuple, Optional, Iterator
 from sentence_transformers import SentenceTransformer
-import PyPDF2
+import pypdfium2 as pdfium
 from pathlib import Path
 
 
+def _torch_threads() -> int:
+    """Intra-op thread count from RAG_THREADS, defaulting to all CPUs."""
+    default = os.cpu_count() or 1
+    value = os.environ.get("RAG_THREADS")
+    if not value:
+        return default
+    try:
+        return max(1, int(value))
+    except ValueError:
+        print(f"Warning: ignoring invalid RAG_THREADS={value!r}, using {default} threads")
+        return default
+
+
+# Size the intra-op thread pool explicitly; gradient tracking is disabled per
+# call with inference_mode() in _encode, since grad mode is thread-local
+torch.set_num_threads(_torch_threads())
+
+# Optional: ONNX Runtime inference for an exported model (see export_onnx.py)
+try:
+    import onnxruntime as ort
+    from transformers import AutoTokenizer
+except ImportError:
+    ort = None
+
+
+def _onnx_export_matches(onnx_model_dir: str, model_name: str) -> bool:
+    """
+    Check that an ONNX export was made from the given sentence-transformers model.
+    
+    Args:
+        onnx_model_dir: Directory written by export_onnx.py
+        model_name: Requested embedding model name
+        
+    Returns:
+        True if source_model.json in the export names the same model
+    """
+    try:
+        with open(os.path.join(onnx_model_dir, "source_model.json")) as f:
+            model_id = json.load(f)['model_id']
+    except (OSError, ValueError, KeyError):
+        return False
+    
+    # Bare names resolve to the sentence-transformers organization on the Hub
+    def normalize(name):
+        return name if '/' in name else f"sentence-transformers/{name}"
+    
+    return normalize(model_id) == normalize(model_name)
+
+
+def extract_text_from_pdf(pdf_path: str) -> str:
+    """Extract text content from PDF file."""
+    text = ""
+    try:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            for page in pdf:
+                text += page.get_textpage().get_text_range() + "\n"
+        finally:
+            pdf.close()
+    except Exception as e:
+        print(f"Error reading {pdf_path}: {e}")
+    return text
+
+
+def extract_text_from_txt(txt_path: str) -> str:
+    """Extract text content from text file."""
+    text = ""
+    try:
+        with open(txt_path, 'r', encoding='utf-8') as file:
+            text = file.read()
+    except Exception as e:
+        print(f"Error reading {txt_path}: {e}")
+    return text
+
+
+def chunk_text(text: str, source: str, chunk_size: int, chunk_overlap: int) -> List[Dict[str, str]]:
+    """
+    Split text into overlapping chunks that end at sentence boundaries.
+    
+    Args:
+        text: Text to chunk
+        source: Source document name
+        chunk_size: Maximum characters per chunk
+        chunk_overlap: Overlap between consecutive chunks
+    
+    Returns:
+        List of chunk dictionaries with text and metadata
+    """
+    # Normalize whitespace
+    text = ' '.join(text.split())
+    text_length = len(text)
+    
+    # Sentence boundaries (offset just past each period), found in one pass
+    boundaries = np.fromiter((m.end() for m in re.finditer(r'\.', text)), dtype=np.int64)
+    
+    chunks = []
+    start = 0
+    
+    while start < text_length:
+        end = min(start + chunk_size, text_length)
+    
+        # Snap to the last sentence boundary before chunk_size
+        if end < text_length:
+            i = np.searchsorted(boundaries, end, side='right') - 1
+            if i >= 0 and boundaries[i] > start + 1:
+                end = int(boundaries[i])
+    
+        chunk_content = text[start:end].strip()
+    
+        if chunk_content and len(chunk_content) > 10:  # Skip very small chunks
+            chunks.append({
+                'text': chunk_content,
+                'source': source,
+                'start_pos': start
+            })
+    
+        if end >= text_length:
+            break
+    
+        # Step back by the overlap, but always move forward
+        next_start = end - chunk_overlap
+        start = next_start if next_start > start else end
+    
+    return chunks
+
+
+def _extract_and_chunk(path: str, source: str, chunk_size: int, chunk_overlap: int) -> List[Dict[str, str]]:
+    """Extract and chunk a single PDF or TXT document (runs in a worker process)."""
+    if path.lower().endswith('.pdf'):
+        text = extract_text_from_pdf(path)
+    else:
+        text = extract_text_from_txt(path)
+    
+    if not text.strip():
+        return []
+    return chunk_text(text, source, chunk_size, chunk_overlap)
+
+
 class RAGPipeline:
-    def __init__(self, embedding_model_name: str = "all-MiniLM-L6-v2", chunk_size: int = 500, chunk_overlap: int = 50):
+    # HNSW graph parameters (see faiss.IndexHNSWSQ)
+    HNSW_M = 32
+    HNSW_EF_CONSTRUCTION = 200
+    HNSW_EF_SEARCH = 64
+
+    # Corpora larger than this switch to a compressed IVF-PQ index
+    IVFPQ_MIN_VECTORS = 100000
+    IVFPQ_NLIST = 256
+    IVFPQ_M = 16
+    IVFPQ_NBITS = 8
+    IVFPQ_NPROBE = 16
+
+    # Texts per encode call when building the index
+    ENCODE_BATCH_SIZE = 256
+
+    # Vectors used to train the quantizer (IVF-PQ needs ~39 per centroid). The
+    # HNSW-SQ index learns its 8-bit value ranges from the same sample, which
+    # covers the whole corpus at the document chunk cap, so no later document
+    # falls outside the trained ranges
+    TRAIN_SAMPLE_SIZE = 40 * IVFPQ_NLIST
+
+    # Max tokens per text for the ONNX path (matches the sentence-transformers model)
+    ONNX_MAX_SEQ_LENGTH = 256
+
+    def __init__(self, embedding_model_name: str = "all-MiniLM-L6-v2", chunk_size: int = 500, chunk_overlap: int = 50,
+                 onnx_model_dir: Optional[str] = "onnx_minilm"):
         """
         Initialize RAG pipeline with embedding model and chunking parameters.
         
@@ -17,91 +186,52 @@ class RAGPipeline:
             embedding_model_name: Name of sentence-transformers model
             chunk_size: Maximum characters per chunk
             chunk_overlap: Overlap between consecutive chunks
+            onnx_model_dir: Directory with a quantized ONNX export of the embedding
+                model (created by export_onnx.py); used instead of PyTorch if present
+                and exported from embedding_model_name
         """
-        print(f"Loading embedding model: {embedding_model_name}...")
-        self.embedding_model = SentenceTransformer(embedding_model_name)
+        self.embedding_model = None
+        self.onnx_session = None
+        self.tokenizer = None
+        
+        onnx_path = os.path.join(onnx_model_dir, "model_quantized.onnx") if onnx_model_dir else None
+        if (ort is not None and onnx_path and os.path.exists(onnx_path)
+                and _onnx_export_matches(onnx_model_dir, embedding_model_name)):
+            print(f"Loading ONNX embedding model: {onnx_path}...")
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self.onnx_session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+            self.onnx_input_names = {i.name for i in self.onnx_session.get_inputs()}
+            self.tokenizer = AutoTokenizer.from_pretrained(onnx_model_dir)
+            self.embedding_dim = self.onnx_session.get_outputs()[0].shape[-1]
+        else:
+            print(f"Loading embedding model: {embedding_model_name}...")
+            self.embedding_model = SentenceTransformer(embedding_model_name)
+            self.embedding_dim = self.embedding_model.get_sentence_embedding_dimension()
+        
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.chunks = []
+        # Chunk store as parallel arrays (struct-of-arrays), indexed like the FAISS index
+        self.texts = []
+        self.source_names = []
+        self.source_idx = np.empty(0, dtype=np.int32)
+        self.start_pos = np.empty(0, dtype=np.int32)
+        self.embeddings = None
         self.index = None
-        self.embedding_dim = self.embedding_model.get_sentence_embedding_dimension()
+        # Directory the in-memory index matches on disk, if any
+        self._loaded_from = None
         
     def extract_text_from_pdf(self, pdf_path: str) -> str:
         """Extract text content from PDF file."""
-        text = ""
-        try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-        except Exception as e:
-            print(f"Error reading {pdf_path}: {e}")
-        return text
+        return extract_text_from_pdf(pdf_path)
     
     def extract_text_from_txt(self, txt_path: str) -> str:
         """Extract text content from text file."""
-        text = ""
-        try:
-            with open(txt_path, 'r', encoding='utf-8') as file:
-                text = file.read()
-        except Exception as e:
-            print(f"Error reading {txt_path}: {e}")
-        return text
+        return extract_text_from_txt(txt_path)
     
     def chunk_text(self, text: str, source: str) -> List[Dict[str, str]]:
-        """
-        Split text into overlapping chunks with memory optimization.
-        
-        Args:
-            text: Text to chunk
-            source: Source document name
-            
-        Returns:
-            List of chunk dictionaries with text and metadata
-        """
-        # Limit total text size BEFORE any processing to prevent memory issues
-        max_text_length = 50000  # Reduced to 50KB per document for safety
-        
-        # Check and truncate FIRST
-        if len(text) > max_text_length:
-            print(f"  Warning: Document {source} is large ({len(text)} chars), truncating to {max_text_length}")
-            text = text[:max_text_length]
-        
-        # Clean text but preserve some structure - do this AFTER truncation
-        text = ' '.join(text.split())
-        
-        chunks = []
-        start = 0
-        chunk_count = 0
-        max_chunks = 200  # Limit chunks per document to prevent memory issues
-        
-        while start < len(text) and chunk_count < max_chunks:
-            end = min(start + self.chunk_size, len(text))
-            
-            # Find the last sentence boundary before chunk_size
-            if end < len(text):
-                last_period = text.rfind('.', start, end)
-                if last_period > start:
-                    end = last_period + 1
-            
-            chunk_text = text[start:end].strip()
-            
-            if chunk_text and len(chunk_text) > 10:  # Skip very small chunks
-                chunks.append({
-                    'text': chunk_text,
-                    'source': source,
-                    'start_pos': start
-                })
-                chunk_count += 1
-            
-            start = end - self.chunk_overlap
-            if start >= len(text):
-                break
-        
-        if chunk_count >= max_chunks:
-            print(f"  Warning: Reached maximum chunk limit ({max_chunks}) for {source}")
-            
-        return chunks
+        """Split text into overlapping chunks using this pipeline's chunk settings."""
+        return chunk_text(text, source, self.chunk_size, self.chunk_overlap)
     
     def process_documents(self, documents_dir: str = "documents"):
         """
@@ -117,79 +247,261 @@ class RAGPipeline:
             print(f"Warning: {documents_dir} directory not found")
             return
         
+        pdf_files = list(documents_path.glob("*.pdf"))
+        txt_files = list(documents_path.glob("*.txt"))
+        files = pdf_files + txt_files
+        
+        if not files:
+            print(f"No PDF or TXT files found in {documents_dir}")
+            return
+        
         all_chunks = []
         max_total_chunks = 1000  # Global limit to prevent memory issues
         
-        # Process PDF files
-        pdf_files = list(documents_path.glob("*.pdf"))
-        for pdf_file in pdf_files:
-            if len(all_chunks) >= max_total_chunks:
-                print(f"Warning: Reached maximum total chunks ({max_total_chunks}), skipping remaining files")
-                break
-                
-            print(f"Processing: {pdf_file.name}")
-            text = self.extract_text_from_pdf(str(pdf_file))
-            
-            if text.strip():
-                chunks = self.chunk_text(text, pdf_file.name)
-                # Only add chunks if we haven't exceeded the limit
-                chunks_to_add = chunks[:max_total_chunks - len(all_chunks)]
-                all_chunks.extend(chunks_to_add)
-                print(f"  Created {len(chunks_to_add)} chunks (total: {len(all_chunks)})")
-        
-        # Process TXT files
-        txt_files = list(documents_path.glob("*.txt"))
-        for txt_file in txt_files:
+        for file, chunks in zip(files, self._extract_and_chunk_files(files)):
             if len(all_chunks) >= max_total_chunks:
                 print(f"Warning: Reached maximum total chunks ({max_total_chunks}), skipping remaining files")
                 break
-                
-            print(f"Processing: {txt_file.name}")
-            text = self.extract_text_from_txt(str(txt_file))
             
-            if text.strip():
-                chunks = self.chunk_text(text, txt_file.name)
-                # Only add chunks if we haven't exceeded the limit
-                chunks_to_add = chunks[:max_total_chunks - len(all_chunks)]
-                all_chunks.extend(chunks_to_add)
-                print(f"  Created {len(chunks_to_add)} chunks (total: {len(all_chunks)})")
-        
-        if not pdf_files and not txt_files:
-            print(f"No PDF or TXT files found in {documents_dir}")
-            return
+            print(f"Processing: {file.name}")
+            # Only add chunks if we haven't exceeded the limit
+            chunks_to_add = chunks[:max_total_chunks - len(all_chunks)]
+            all_chunks.extend(chunks_to_add)
+            print(f"  Created {len(chunks_to_add)} chunks (total: {len(all_chunks)})")
         
-        self.chunks = all_chunks
-        print(f"\nTotal chunks created: {len(self.chunks)}")
+        self._set_chunks(all_chunks)
+        print(f"\nTotal chunks created: {len(self.texts)}")
         
-        if self.chunks:
+        if self.texts:
             self.build_index()
     
+    def _set_chunks(self, chunks: List[Dict]):
+        """
+        Store chunk dictionaries as parallel arrays.
+        
+        Args:
+            chunks: Chunk dictionaries with text, source and start_pos
+        """
+        source_ids = {}
+        self.texts = [chunk['text'] for chunk in chunks]
+        self.source_idx = np.array(
+            [source_ids.setdefault(chunk['source'], len(source_ids)) for chunk in chunks],
+            dtype=np.int32
+        )
+        self.source_names = list(source_ids)
+        self.start_pos = np.array([chunk['start_pos'] for chunk in chunks], dtype=np.int32)
+    
+    def _extract_and_chunk_files(self, files: List[Path]) -> List[List[Dict[str, str]]]:
+        """
+        Extract and chunk documents, in parallel worker processes when possible.
+        
+        Args:
+            files: Document paths
+            
+        Returns:
+            List of chunks for each file, in the same order as files
+        """
+        args = [(str(f), f.name, self.chunk_size, self.chunk_overlap) for f in files]
+        
+        # Only fork: spawn/forkserver children re-import __main__ (e.g. app.py,
+        # which loads the model and builds the index at import time)
+        if len(files) < 2 or 'fork' not in multiprocessing.get_all_start_methods():
+            return [_extract_and_chunk(*a) for a in args]
+        
+        with ProcessPoolExecutor(max_workers=min(len(files), os.cpu_count() or 1),
+                                 mp_context=multiprocessing.get_context('fork')) as executor:
+            return list(executor.map(_extract_and_chunk, *zip(*args)))
+    
     def build_index(self):
-        """Build FAISS vector index from document chunks with batch processing."""
+        """Build FAISS vector index from document chunks, indexing each batch while the next is encoded."""
         print("\nGenerating embeddings...")
         
-        chunk_texts = [chunk['text'] for chunk in self.chunks]
-        
-        # Process embeddings in batches to reduce memory usage
-        batch_size = 100
-        all_embeddings = []
+        chunk_texts = self.texts
+        num_chunks = len(chunk_texts)
+        
+        # Keep a float16 copy so the index can be rebuilt without re-encoding
+        self.embeddings = np.empty((num_chunks, self.embedding_dim), dtype=np.float16)
+        
+        # Producer thread encodes batch i+1 while this thread adds batch i to the index
+        batches = queue.Queue(maxsize=2)
+        stop = threading.Event()
+        
+        def put(item):
+            # Give up once indexing has stopped, instead of blocking on a full queue
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        def encode_batches():
+            try:
+                for start in range(0, num_chunks, self.ENCODE_BATCH_SIZE):
+                    batch = chunk_texts[start:start + self.ENCODE_BATCH_SIZE]
+                    if not put((start, self._encode(batch, batch_size=self.ENCODE_BATCH_SIZE))):
+                        return
+                put(None)
+            except Exception as e:
+                put(e)
+        
+        def encoded_batches():
+            while True:
+                item = batches.get()
+                if item is None:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                
+                start, embeddings = item
+                self.embeddings[start:start + len(embeddings)] = embeddings
+                print(f"  Embedded {start + len(embeddings)}/{num_chunks} chunks")
+                yield embeddings
         
-        for i in range(0, len(chunk_texts), batch_size):
-            batch = chunk_texts[i:i+batch_size]
-            batch_embeddings = self.embedding_model.encode(batch, show_progress_bar=True)
-            all_embeddings.append(batch_embeddings)
+        producer = threading.Thread(target=encode_batches, daemon=True)
+        producer.start()
+        try:
+            self._index_batches(encoded_batches(), num_chunks)
+        finally:
+            stop.set()
+            producer.join()
+    
+    def _index_embeddings(self, embeddings: np.ndarray, batch_size: int = 4096):
+        """
+        Build the FAISS index from stored normalized embeddings.
         
-        embeddings = np.vstack(all_embeddings).astype('float32')
+        Args:
+            embeddings: Normalized embeddings (e.g. the float16 memmap), one row per chunk
+            batch_size: Rows converted to float32 and added at a time
+        """
+        batches = (embeddings[i:i + batch_size] for i in range(0, len(embeddings), batch_size))
+        self._index_batches(batches, len(embeddings))
+    
+    def _index_batches(self, batches: Iterator[np.ndarray], num_vectors: int):
+        """
+        Create the FAISS index and add embeddings batch by batch.
         
-        # Normalize embeddings for cosine similarity
-        faiss.normalize_L2(embeddings)
+        Batches are held back until TRAIN_SAMPLE_SIZE vectors (or all of them,
+        for smaller corpora) have arrived to train the index; after that each
+        batch is added as soon as it arrives.
         
+        Args:
+            batches: Normalized embedding batches, in chunk order
+            num_vectors: Total number of vectors across all batches
+        """
         print("Building FAISS index...")
-        self.index = faiss.IndexFlatIP(self.embedding_dim)
-        self.index.add(embeddings)
+        self.index = self._create_index(num_vectors)
+        self._loaded_from = None
+        train_size = min(self.TRAIN_SAMPLE_SIZE, num_vectors)
+        pending = []
+        pending_count = 0
+        
+        for batch in batches:
+            batch = np.ascontiguousarray(batch, dtype=np.float32)
+            if self.index.is_trained:
+                self.index.add(batch)
+                continue
+            
+            pending.append(batch)
+            pending_count += len(batch)
+            if pending_count >= train_size:
+                sample = np.vstack(pending)
+                self.index.train(sample)
+                self.index.add(sample)
+                pending = []
+        
+        self._configure_search()
         
         print(f"Index built with {self.index.ntotal} vectors")
     
+    def _encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Encode texts with the ONNX model if loaded, otherwise sentence-transformers.
+        
+        Args:
+            texts: Texts to encode
+            batch_size: Number of texts per forward pass
+            show_progress_bar: Show a progress bar (sentence-transformers only)
+            
+        Returns:
+            Array of L2-normalized embeddings, one row per text
+        """
+        if self.onnx_session is not None:
+            return self._encode_onnx(texts, batch_size)
+        with torch.inference_mode():
+            return self.embedding_model.encode(
+                texts, batch_size=batch_size, show_progress_bar=show_progress_bar,
+                convert_to_numpy=True, normalize_embeddings=True
+            )
+    
+    def _encode_onnx(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Encode texts with the ONNX Runtime session (mean pooling + L2 normalization).
+        
+        Args:
+            texts: Texts to encode
+            batch_size: Number of texts per forward pass
+            
+        Returns:
+            Array of normalized float32 embeddings
+        """
+        # Longest first, so each batch pads to similar lengths
+        order = np.argsort([-len(text) for text in texts], kind='stable')
+        sorted_texts = [texts[i] for i in order]
+        
+        all_embeddings = []
+        for i in range(0, len(sorted_texts), batch_size):
+            tokens = self.tokenizer(
+                sorted_texts[i:i+batch_size], padding=True, truncation=True,
+                max_length=self.ONNX_MAX_SEQ_LENGTH, return_tensors="np"
+            )
+            inputs = {name: tokens[name] for name in self.onnx_input_names}
+            token_embeddings = self.onnx_session.run(None, inputs)[0]
+            
+            # Mean pooling over non-padding tokens
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            all_embeddings.append(pooled.astype(np.float32))
+        
+        # Restore the input order
+        embeddings = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+        embeddings[order] = np.vstack(all_embeddings)
+        return embeddings
+    
+    def _create_index(self, num_vectors: int) -> faiss.Index:
+        """
+        Create an approximate nearest-neighbour index sized for the corpus.
+        
+        Args:
+            num_vectors: Number of embeddings that will be added
+            
+        Returns:
+            Empty inner-product FAISS index (may require training)
+        """
+        if num_vectors >= self.IVFPQ_MIN_VECTORS:
+            quantizer = faiss.IndexFlatIP(self.embedding_dim)
+            return faiss.IndexIVFPQ(
+                quantizer, self.embedding_dim, self.IVFPQ_NLIST,
+                self.IVFPQ_M, self.IVFPQ_NBITS, faiss.METRIC_INNER_PRODUCT
+            )
+        
+        # HNSW graph over 8-bit scalar-quantized vectors (4x smaller than float32)
+        index = faiss.IndexHNSWSQ(
+            self.embedding_dim, faiss.ScalarQuantizer.QT_8bit,
+            self.HNSW_M, faiss.METRIC_INNER_PRODUCT
+        )
+        index.hnsw.efConstruction = self.HNSW_EF_CONSTRUCTION
+        return index
+    
+    def _configure_search(self):
+        """Apply search-time parameters to the current index."""
+        if hasattr(self.index, 'hnsw'):
+            self.index.hnsw.efSearch = self.HNSW_EF_SEARCH
+        elif hasattr(self.index, 'nprobe'):
+            self.index.nprobe = self.IVFPQ_NPROBE
+    
     def retrieve(self, query: str, top_k: int = 3) -> List[Dict]:
         """
         Retrieve top-k most relevant chunks for a query.
@@ -201,56 +513,190 @@ class RAGPipeline:
         Returns:
             List of retrieved chunks with scores
         """
-        if self.index is None or len(self.chunks) == 0:
+        if self.index is None or len(self.texts) == 0:
             return []
         
-        # Encode query
-        query_embedding = self.embedding_model.encode([query])
-        query_embedding = np.array(query_embedding).astype('float32')
-        faiss.normalize_L2(query_embedding)
+        return self.search_embeddings(self.encode_queries([query]), top_k)[0]
+    
+    def retrieve_precomputed(self, query_embedding: np.ndarray, top_k: int = 3) -> List[Dict]:
+        """
+        Retrieve top-k chunks for a query that was already encoded.
         
-        # Search
-        scores, indices = self.index.search(query_embedding, min(top_k, len(self.chunks)))
+        Args:
+            query_embedding: Normalized embedding from encode_queries()
+            top_k: Number of chunks to retrieve
+            
+        Returns:
+            List of retrieved chunks with scores
+        """
+        query_embedding = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+        return self.search_embeddings(query_embedding, top_k)[0]
+    
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Encode one or more queries in a single forward pass.
         
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.chunks):
-                results.append({
-                    'text': self.chunks[idx]['text'],
-                    'source': self.chunks[idx]['source'],
-                    'score': float(score)
-                })
+        Args:
+            queries: User queries
+            
+        Returns:
+            Normalized float32 query embeddings, one row per query
+        """
+        query_embeddings = self._encode(queries, batch_size=max(len(queries), 1))
+        return query_embeddings.astype(np.float32, copy=False)
+    
+    def search_embeddings(self, query_embeddings: np.ndarray, top_k: int = 3) -> List[List[Dict]]:
+        """
+        Retrieve top-k chunks for a batch of already-encoded queries.
         
-        return results
+        Args:
+            query_embeddings: Normalized query embeddings from encode_queries()
+            top_k: Number of chunks to retrieve per query
+            
+        Returns:
+            One list of retrieved chunks with scores per query
+        """
+        if self.index is None or len(self.texts) == 0:
+            return [[] for _ in range(len(query_embeddings))]
+        
+        scores, indices = self.index.search(query_embeddings, min(top_k, len(self.texts)))
+        
+        # Approximate indexes pad missing results with -1
+        valid = (indices >= 0) & (indices < len(self.texts))
+        
+        all_results = []
+        for row_scores, row_indices, row_valid in zip(scores, indices, valid):
+            idxs = row_indices[row_valid]
+            all_results.append([
+                {
+                    'text': self.texts[idx],
+                    'source': self.source_names[source_id],
+                    'score': score
+                }
+                for idx, source_id, score in zip(
+                    idxs.tolist(), self.source_idx[idxs].tolist(), row_scores[row_valid].tolist()
+                )
+            ])
+        
+        return all_results
     
     def save_index(self, save_dir: str = "vector_store"):
-        """Save the FAISS index and chunks to disk."""
+        """
+        Save the FAISS index, embeddings and chunks to disk.
+        
+        Files written to save_dir:
+            faiss.index: FAISS index
+            embeddings.f16: Raw float16 embeddings (memory-mapped on load)
+            chunks.jsonl: One {"source", "start_pos", "len"} record per chunk
+            chunks.txt: All chunk texts concatenated, sliced using "len"
+            meta.json: Embedding array shape
+        """
         os.makedirs(save_dir, exist_ok=True)
         
+        # Each file is written to a temporary path and renamed into place: the
+        # loaded index and embeddings may be memory-mapped from these same
+        # files, and truncating them in place would corrupt what is read
+        def temp_path(name):
+            return os.path.join(save_dir, name + ".tmp")
+        
+        written = []
         if self.index is not None:
-            faiss.write_index(self.index, os.path.join(save_dir, "faiss.index"))
+            faiss.write_index(self.index, temp_path("faiss.index"))
+            written.append("faiss.index")
+        
+        if self.embeddings is not None:
+            np.asarray(self.embeddings, dtype=np.float16).tofile(temp_path("embeddings.f16"))
+            with open(temp_path("meta.json"), 'w') as f:
+                json.dump({'shape': list(self.embeddings.shape)}, f)
+            written += ["embeddings.f16", "meta.json"]
+        
+        with open(temp_path("chunks.jsonl"), 'w', encoding='utf-8') as meta, \
+                open(temp_path("chunks.txt"), 'w', encoding='utf-8', newline='') as blob:
+            for text, source_id, start_pos in zip(self.texts, self.source_idx.tolist(), self.start_pos.tolist()):
+                meta.write(json.dumps({
+                    'source': self.source_names[source_id],
+                    'start_pos': start_pos,
+                    'len': len(text)
+                }) + "\n")
+                blob.write(text)
+        written += ["chunks.jsonl", "chunks.txt"]
+        
+        for name in written:
+            os.replace(temp_path(name), os.path.join(save_dir, name))
+        
+        self._loaded_from = save_dir
+        print(f"Index saved to {save_dir}")
+    
+    def _read_index(self, index_path: str) -> faiss.Index:
+        """
+        Read a saved FAISS index, memory-mapping its codes where supported.
         
-        with open(os.path.join(save_dir, "chunks.pkl"), 'wb') as f:
-            pickle.dump(self.chunks, f)
+        IO_FLAG_MMAP_IFC (newer faiss) maps the stored codes of flat and
+        HNSW-SQ indexes; older releases only offer IO_FLAG_MMAP, which maps
+        IVF inverted lists and still copies everything else into memory.
         
-        print(f"Index saved to {save_dir}")
+        Args:
+            index_path: Path to faiss.index
+            
+        Returns:
+            The loaded index
+        """
+        flag = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP)
+        try:
+            return faiss.read_index(index_path, flag)
+        except RuntimeError:
+            # Index types without mmap support are read into memory
+            return faiss.read_index(index_path)
     
     def load_index(self, save_dir: str = "vector_store"):
-        """Load the FAISS index and chunks from disk."""
-        index_path = os.path.join(save_dir, "faiss.index")
-        chunks_path = os.path.join(save_dir, "chunks.pkl")
+        """
+        Load the FAISS index and chunks from disk.
         
-        if os.path.exists(index_path) and os.path.exists(chunks_path):
-            self.index = faiss.read_index(index_path)
-            
-            with open(chunks_path, 'rb') as f:
-                self.chunks = pickle.load(f)
-            
-            print(f"Loaded index with {self.index.ntotal} vectors")
+        If only the embeddings were saved (or faiss.index was deleted), the
+        index is rebuilt from them without re-encoding any text. Calling this
+        again for the directory already in memory is a no-op.
+        """
+        if self.index is not None and self._loaded_from == save_dir:
             return True
         
-        return False
-
+        index_path = os.path.join(save_dir, "faiss.index")
+        embeddings_path = os.path.join(save_dir, "embeddings.f16")
+        meta_path = os.path.join(save_dir, "meta.json")
+        chunks_path = os.path.join(save_dir, "chunks.jsonl")
+        text_path = os.path.join(save_dir, "chunks.txt")
+        
+        if not (os.path.exists(chunks_path) and os.path.exists(text_path)):
+            return False
+        
+        if os.path.exists(embeddings_path) and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                shape = tuple(json.load(f)['shape'])
+            self.embeddings = np.memmap(embeddings_path, dtype=np.float16, mode='r', shape=shape)
+        
+        if os.path.exists(index_path):
+            self.index = self._read_index(index_path)
+            self._configure_search()
+        elif self.embeddings is not None:
+            self._index_embeddings(self.embeddings)
+        else:
+            return False
+        
+        with open(text_path, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        
+        with open(chunks_path, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        
+        ends = np.cumsum([record['len'] for record in records]).tolist()
+        starts = [0] + ends[:-1]
+        self._set_chunks([
+            {'text': text[start:end], 'source': record['source'], 'start_pos': record['start_pos']}
+            for record, start, end in zip(records, starts, ends)
+        ])
+        
+        self._loaded_from = save_dir
+        print(f"Loaded index with {self.index.ntotal} vectors")
+        return True
 
 if __name__ == "__main__":
     # Test the pipeline
@@ -11,7 +11,7 @@ def check_dependencies():
         import flask
         import sentence_transformers
         import faiss
-        import PyPDF2
+        import pypdfium2
         print("✅ All dependencies installed")
         return True
     except ImportError as e:
@@ -71,7 +71,7 @@ def build_index():
     # Build new index
     rag.process_documents()
     
-    if len(rag.chunks) == 0:
+    if len(rag.texts) == 0:
         print("❌ No chunks created. Check your documents.")
         return False
     
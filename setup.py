@@ -4,17 +4,87 @@ Automated setup script for Construction Marketplace RAG Assistant.
 Checks dependencies and guides through setup process.
 """
 import os
+import re
 import sys
+import argparse
 import subprocess
 
+# Skip Hugging Face telemetry calls when the embedding model is loaded
+os.environ.setdefault("HF_HUB_DISABLE_TELEMETRY", "1")
 
-def print_banner():
-    """Print welcome banner."""
-    print("""
+# Document types picked up by the index build
+_DOC_EXTS = ('.pdf', '.txt')
+
+# Placeholder OpenRouter key in .env.example, replaced with the user's key
+_KEY_RE = re.compile(rb'sk-or-v1-[A-Za-z0-9]+')
+
+# Set by --yes: answer every prompt with its default
+_ASSUME_YES = False
+
+# Static banners, encoded once (the trailing newline stands in for print's)
+_BANNER = """
 ╔═══════════════════════════════════════════════════════════╗
 ║   🏗️  Construction Marketplace RAG Assistant Setup       ║
 ╚═══════════════════════════════════════════════════════════╝
-    """)
+    
+""".encode('utf-8')
+
+_NEXT = """
+╔═══════════════════════════════════════════════════════════╗
+║                    ✅ Setup Complete!                     ║
+╚═══════════════════════════════════════════════════════════╝
+
+🚀 Next Steps:
+
+1. Start the application:
+   python app.py
+   
+   or use the convenience script:
+   python run.py
+
+2. Open your browser to:
+   http://localhost:5000
+
+3. Try example queries:
+   - What factors affect construction project delays?
+   - What are the safety requirements?
+
+📚 Documentation:
+   - README.md - Full documentation
+   - QUICKSTART.md - Quick setup guide
+   - DEPLOYMENT.md - Deployment instructions
+
+🧪 Testing:
+   - python test_system.py - System tests
+   - python evaluate.py - Quality evaluation
+
+💡 Tips:
+   - Add more documents to documents/ folder
+   - Rebuild index: python rag_pipeline.py
+   - Customize UI in templates/index.html
+
+Need help? Check README.md or PROJECT_SUMMARY.md
+    
+""".encode('utf-8')
+
+
+def ask(prompt, default):
+    """Prompt the user, or return the default answer in --yes mode."""
+    if _ASSUME_YES:
+        return default
+    return input(prompt).strip().lower()
+
+
+def _write_bytes(data):
+    """Write pre-encoded text straight to the stdout buffer in one call."""
+    sys.stdout.flush()
+    sys.stdout.buffer.write(data)
+    sys.stdout.buffer.flush()
+
+
+def print_banner():
+    """Print welcome banner."""
+    _write_bytes(_BANNER)
 
 
 def check_python_version():
@@ -34,10 +104,18 @@ def install_dependencies():
     """Install required Python packages."""
     print("\n✓ Installing dependencies...")
     
+    # Reuse the persistent wheel cache and prefer prebuilt wheels over
+    # source builds; explicit user settings take precedence
+    env = dict(os.environ)
+    env.setdefault("PIP_CACHE_DIR", os.path.expanduser("~/.cache/pip"))
+    env.setdefault("PIP_DISABLE_PIP_VERSION_CHECK", "1")
+    
     try:
         subprocess.check_call([
-            sys.executable, "-m", "pip", "install", "-r", "requirements.txt"
-        ])
+            sys.executable, "-m", "pip", "install",
+            "--prefer-binary", "--disable-pip-version-check", "--no-input",
+            "-r", "requirements.txt"
+        ], env=env)
         print("  ✅ Dependencies installed")
         return True
     except subprocess.CalledProcessError:
@@ -49,45 +127,62 @@ def setup_env_file():
     """Create .env file if it doesn't exist."""
     print("\n✓ Setting up environment file...")
     
-    if os.path.exists('.env'):
+    try:
+        os.stat('.env')
+        env_exists = True
+    except FileNotFoundError:
+        env_exists = False
+    
+    if env_exists:
         print("  ⚠️  .env file already exists")
-        response = input("  Overwrite? (y/N): ").strip().lower()
+        response = ask("  Overwrite? (y/N): ", 'n')
         if response != 'y':
             print("  ⏭️  Skipping .env setup")
             return True
     
     # Copy from example
-    if os.path.exists('.env.example'):
-        with open('.env.example', 'r') as src:
+    try:
+        with open('.env.example', 'rb') as src:
             content = src.read()
-        
+    except FileNotFoundError:
+        print("  ❌ .env.example not found")
+        return False
+    
+    # With --yes the example key is kept and can be edited later
+    api_key = ''
+    if not _ASSUME_YES:
         print("\n  Please enter your OpenRouter API key")
         print("  (Get it from: https://openrouter.ai/)")
         api_key = input("  API Key: ").strip()
-        
-        if api_key:
-            content = content.replace('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', api_key)
-        
-        with open('.env', 'w') as dst:
-            dst.write(content)
-        
-        print("  ✅ .env file created")
-        return True
-    else:
-        print("  ❌ .env.example not found")
-        return False
+    
+    if api_key:
+        key = api_key.encode()
+        # A callable replacement keeps backslashes in the key literal
+        content = _KEY_RE.sub(lambda match: key, content, count=1)
+    
+    # Single binary write, no str round-trip
+    with open('.env', 'wb') as dst:
+        dst.write(content)
+    
+    print("  ✅ .env file created")
+    return True
 
 
 def check_documents():
     """Check for documents in documents folder."""
     print("\n✓ Checking for documents...")
     
-    if not os.path.exists('documents'):
-        os.makedirs('documents')
+    # One mkdir call instead of an exists() probe first
+    try:
+        os.mkdir('documents')
         print("  📁 Created documents/ folder")
+    except FileExistsError:
+        pass
     
-    doc_files = [f for f in os.listdir('documents') 
-                 if f.endswith(('.pdf', '.txt'))]
+    # scandir gets the file type from the directory listing itself
+    with os.scandir('documents') as entries:
+        doc_files = [e.name for e in entries
+                     if e.is_file() and e.name.endswith(_DOC_EXTS)]
     
     if not doc_files:
         print("  ⚠️  No documents found in documents/ folder")
@@ -96,7 +191,7 @@ def check_documents():
         print("  2. Place in documents/ folder")
         print("  3. Or use the sample_faq.txt for testing")
         
-        response = input("\n  Continue anyway? (y/N): ").strip().lower()
+        response = ask("\n  Continue anyway? (y/N): ", 'n')
         return response == 'y'
     
     print(f"  ✅ Found {len(doc_files)} document(s)")
@@ -106,14 +201,19 @@ def check_documents():
 
 
 def build_index():
-    """Build the FAISS vector index."""
+    """
+    Build the FAISS vector index.
+    
+    Returns:
+        The built RAGPipeline, or None if the build was skipped or failed
+    """
     print("\n✓ Building vector index...")
     
-    response = input("  Build index now? (Y/n): ").strip().lower()
+    response = ask("  Build index now? (Y/n): ", 'y')
     if response == 'n':
         print("  ⏭️  Skipping index build")
         print("     Run 'python rag_pipeline.py' manually later")
-        return True
+        return None
     
     try:
         print("\n  Processing documents...")
@@ -122,78 +222,67 @@ def build_index():
         rag = rag_pipeline.RAGPipeline()
         rag.process_documents()
         
-        if len(rag.chunks) > 0:
+        if len(rag.texts) > 0:
             rag.save_index()
-            print(f"  ✅ Index built with {len(rag.chunks)} chunks")
-            return True
+            print(f"  ✅ Index built with {len(rag.texts)} chunks")
+            return rag
         else:
             print("  ⚠️  No chunks created - check your documents")
-            return False
+            return None
             
     except Exception as e:
         print(f"  ❌ Error building index: {e}")
-        return False
+        return None
 
 
-def run_tests():
-    """Run system tests."""
+def run_tests(rag=None):
+    """
+    Run system tests.
+    
+    Args:
+        rag: Optional RAGPipeline from build_index, reused so the
+            embedding model is not loaded a second time
+    """
     print("\n✓ Running system tests...")
     
-    response = input("  Run tests? (Y/n): ").strip().lower()
+    response = ask("  Run tests? (Y/n): ", 'y')
     if response == 'n':
         print("  ⏭️  Skipping tests")
         return True
     
+    # Run in-process so an already-loaded pipeline can be reused; a
+    # crashing test must not abort the rest of setup
     try:
-        subprocess.check_call([sys.executable, "test_system.py"])
-        return True
-    except subprocess.CalledProcessError:
-        print("  ⚠️  Some tests failed")
+        import test_system
+        
+        if test_system.test_rag_pipeline(rag=rag):
+            return True
+    except Exception as e:
+        print(f"  ❌ Error running tests: {e}")
         return False
+    
+    print("  ⚠️  Some tests failed")
+    return False
 
 
 def print_next_steps():
     """Print next steps for the user."""
-    print("""
-╔═══════════════════════════════════════════════════════════╗
-║                    ✅ Setup Complete!                     ║
-╚═══════════════════════════════════════════════════════════╝
+    _write_bytes(_NEXT)
 
-🚀 Next Steps:
 
-1. Start the application:
-   python app.py
-   
-   or use the convenience script:
-   python run.py
-
-2. Open your browser to:
-   http://localhost:5000
-
-3. Try example queries:
-   - What factors affect construction project delays?
-   - What are the safety requirements?
-
-📚 Documentation:
-   - README.md - Full documentation
-   - QUICKSTART.md - Quick setup guide
-   - DEPLOYMENT.md - Deployment instructions
-
-🧪 Testing:
-   - python test_system.py - System tests
-   - python evaluate.py - Quality evaluation
-
-💡 Tips:
-   - Add more documents to documents/ folder
-   - Rebuild index: python rag_pipeline.py
-   - Customize UI in templates/index.html
-
-Need help? Check README.md or PROJECT_SUMMARY.md
-    """)
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Set up the Construction Marketplace RAG Assistant")
+    parser.add_argument('-y', '--yes', '--no-input', dest='yes', action='store_true',
+                        help="Run without prompts, using the default answer for each")
+    return parser.parse_args()
 
 
 def main():
     """Main setup flow."""
+    global _ASSUME_YES
+    _ASSUME_YES = parse_args().yes
+    
     print_banner()
     
     # Check Python version
@@ -202,7 +291,7 @@ def main():
     
     # Install dependencies
     print("\nStep 1: Dependencies")
-    response = input("Install required packages? (Y/n): ").strip().lower()
+    response = ask("Install required packages? (Y/n): ", 'y')
     if response != 'n':
         if not install_dependencies():
             print("\n❌ Setup failed at dependency installation")
@@ -214,6 +303,7 @@ def main():
         print("\n⚠️  Warning: .env file not configured properly")
     
     # Check documents
+    rag = None
     print("\nStep 3: Documents")
     if not check_documents():
         print("\n⚠️  No documents to process")
@@ -221,11 +311,11 @@ def main():
     else:
         # Build index
         print("\nStep 4: Vector Index")
-        build_index()
+        rag = build_index()
     
     # Run tests
     print("\nStep 5: Testing")
-    run_tests()
+    run_tests(rag=rag)
     
     # Print next steps
     print_next_steps()
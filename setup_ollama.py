@@ -2,9 +2,26 @@
 Script to pull Ollama model using the API
 """
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import sys
 import time
 
+# orjson is optional; fall back to the stdlib decoder
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
+# Reuse one pooled connection for the tags check, pull and list calls
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4,
+                                     max_retries=Retry(total=2, backoff_factor=0.2)))
+
+# (connect, read) timeouts: the read timeout applies between streamed chunks
+PULL_TIMEOUT = (5, 30)
+PULL_ATTEMPTS = 3
+
 def pull_model(model_name="llama3.1"):
     """Pull a model using Ollama API"""
     url = "http://localhost:11434/api/pull"
@@ -16,52 +33,105 @@ def pull_model(model_name="llama3.1"):
     print(f"Pulling model: {model_name}")
     print("This may take a few minutes depending on your internet speed...\n")
     
-    try:
-        response = requests.post(url, json=payload, stream=True, timeout=600)
-        
-        if response.status_code == 200:
-            for line in response.iter_lines():
-                if line:
-                    try:
-                        data = json.loads(line)
-                        status = data.get('status', '')
-                        
-                        if 'total' in data and 'completed' in data:
-                            total = data['total']
-                            completed = data['completed']
-                            percent = (completed / total * 100) if total > 0 else 0
-                            print(f"\r{status}: {percent:.1f}%", end='', flush=True)
-                        else:
-                            print(f"\r{status}", end='', flush=True)
-                            
-                    except json.JSONDecodeError:
-                        pass
+    # A stalled stream times out after PULL_TIMEOUT[1] seconds; pulling
+    # again resumes from the layers Ollama has already downloaded
+    for attempt in range(1, PULL_ATTEMPTS + 1):
+        try:
+            response = SESSION.post(url, json=payload, stream=True, timeout=PULL_TIMEOUT)
             
-            print("\n\n✅ Model pulled successfully!")
-            return True
-        else:
-            print(f"❌ Error: {response.status_code}")
-            print(response.text)
-            return False
+            if response.status_code == 200:
+                buffer = b""
+                last_line = None
+                last_print = 0.0
+                shown = None
+                monotonic = time.monotonic
+                parse = _format_progress
+                _w = sys.stdout.write
+                _flush = sys.stdout.flush
+                
+                # Read large blocks and only parse the newest complete progress
+                # record, redrawing at most 10 times per second
+                for block in response.iter_content(chunk_size=64 * 1024):
+                    buffer += block
+                    newline = buffer.rfind(b"\n")
+                    if newline < 0:
+                        continue
+                    
+                    complete, buffer = buffer[:newline], buffer[newline + 1:]
+                    line = complete[complete.rfind(b"\n") + 1:]
+                    if line.strip():
+                        last_line = line
+                    
+                    now = monotonic()
+                    if last_line is not None and now - last_print >= 0.1:
+                        last_print = now
+                        # Skip the redraw when the rounded progress is unchanged
+                        text = parse(last_line)[1]
+                        if text != shown:
+                            _w(text)
+                            _flush()
+                            shown = text
+                
+                if buffer.strip():
+                    last_line = buffer
+                
+                # The final record reports success or an error
+                final, text = parse(last_line) if last_line is not None else ({}, None)
+                if text is not None and text != shown:
+                    _w(text)
+                    _flush()
+                if 'error' in final:
+                    print(f"\n\n❌ Error: {final['error']}")
+                    return False
+                
+                print("\n\n✅ Model pulled successfully!")
+                return True
+            else:
+                print(f"❌ Error: {response.status_code}")
+                print(response.text)
+                return False
+                
+        except (requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError) as e:
+            if attempt == PULL_ATTEMPTS:
+                print(f"\n❌ Error pulling model: {e}")
+                return False
+            print(f"\n⚠️  Pull stalled, retrying ({attempt}/{PULL_ATTEMPTS - 1})...")
             
-    except Exception as e:
-        print(f"❌ Error pulling model: {e}")
-        return False
+        except Exception as e:
+            print(f"❌ Error pulling model: {e}")
+            return False
+
+def _format_progress(line):
+    """Parse one pull progress record; returns (record, in-place status text)"""
+    try:
+        data = _loads(line)
+    except ValueError:
+        return {}, None
+    
+    # Not every record has all fields (error records have no status)
+    status = data.get('status', '')
+    total = data.get('total')
+    completed = data.get('completed')
+    
+    if total is not None and completed is not None:
+        percent = (completed / total * 100) if total > 0 else 0
+        return data, "\r%s: %.1f%%" % (status, percent)
+    
+    return data, "\r" + status
 
 def list_models():
     """List available models"""
     url = "http://localhost:11434/api/tags"
     
     try:
-        response = requests.get(url, timeout=10)
+        response = SESSION.get(url, timeout=10)
         if response.status_code == 200:
             data = response.json()
             models = data.get('models', [])
             
             if models:
-                print("\n📦 Available models:")
-                for model in models:
-                    print(f"  - {model['name']}")
+                sys.stdout.write("\n📦 Available models:\n"
+                                 + "".join(f"  - {model['name']}\n" for model in models))
             else:
                 print("\n📦 No models installed yet")
             return models
@@ -78,7 +148,7 @@ if __name__ == "__main__":
     
     # Check if Ollama is running
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        response = SESSION.get("http://localhost:11434/api/tags", timeout=5)
         print("✅ Ollama is running!\n")
     except:
         print("❌ Ollama is not running. Please start Ollama first.")
@@ -87,8 +157,9 @@ if __name__ == "__main__":
     # List current models
     models = list_models()
     
-    # Pull llama3.1 if not already available
-    if not any('llama3.1' in model['name'] for model in models):
+    # Pull llama3.1 if not already available (any tag, e.g. llama3.1:latest)
+    names = [model['name'] for model in models]
+    if not any(name.startswith('llama3.1') for name in names):
         print("\nPulling llama3.1 model...")
         if pull_model("llama3.1"):
             list_models()
@@ -42,8 +42,8 @@ async function handleSubmit(e) {
     sendBtn.disabled = true;
     
     try {
-        // Call API
-        const response = await fetch(`${API_BASE_URL}/api/query`, {
+        // Call streaming API
+        const response = await fetch(`${API_BASE_URL}/api/query/stream`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -55,13 +55,20 @@ async function handleSubmit(e) {
             throw new Error('Failed to get response from server');
         }
         
-        const data = await response.json();
+        let answerDiv = null;
         
-        // Remove loading
-        removeLoading(loadingId);
-        
-        // Add assistant response
-        addAssistantMessage(data);
+        await readEventStream(response, event => {
+            if (event.type === 'context') {
+                // Remove loading and show context; answer text streams in below
+                removeLoading(loadingId);
+                answerDiv = addAssistantMessage({ answer: '', context: event.context });
+            } else if (event.type === 'token' && answerDiv) {
+                answerDiv.textContent += event.text;
+                scrollToBottom();
+            } else if (event.type === 'error') {
+                throw new Error(event.error);
+            }
+        });
         
     } catch (error) {
         console.error('Error:', error);
@@ -74,6 +81,28 @@ async function handleSubmit(e) {
     }
 }
 
+// Read a Server-Sent Events response, calling onEvent with each parsed event
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop();
+        
+        for (const frame of frames) {
+            if (frame.startsWith('data: ')) {
+                onEvent(JSON.parse(frame.slice(6)));
+            }
+        }
+    }
+}
+
 // Add user message to chat
 function addUserMessage(text) {
     const messageDiv = document.createElement('div');
@@ -117,6 +146,7 @@ function addAssistantMessage(data) {
     
     chatContainer.appendChild(messageDiv);
     scrollToBottom();
+    return messageDiv.querySelector('.message-content');
 }
 
 // Show loading indicator
@@ -1,10 +1,45 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
+from functools import lru_cache
+import socket
+import sys
 from dotenv import load_dotenv
 
-load_dotenv()
+_ENV_LOADED = False
 
-api_key = os.getenv('OLLAMA_API_KEY')
+# Reuse one pooled connection for requests to Ollama
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4,
+                                     max_retries=Retry(total=2, backoff_factor=0.2)))
+
+
+def _ollama_up():
+    """Fast TCP probe so a stopped Ollama fails in milliseconds, not on the HTTP timeout"""
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.settimeout(0.05)
+    try:
+        return s.connect_ex(('127.0.0.1', 11434)) == 0
+    finally:
+        s.close()
+
+
+@lru_cache(maxsize=1)
+def get_api_key():
+    """Parse .env at most once and return the Ollama API key"""
+    global _ENV_LOADED
+    if not _ENV_LOADED:
+        load_dotenv()
+        _ENV_LOADED = True
+    return os.getenv('OLLAMA_API_KEY')
+
+
+if not _ollama_up():
+    print('⚠️ Ollama is not running on localhost:11434. Install from: https://ollama.com/')
+    sys.exit(1)
+
+api_key = get_api_key()
 print(f'API Key (first 20 chars): {api_key[:20] if api_key else "NOT FOUND"}...')
 
 url = 'http://localhost:11434/api/chat'
@@ -29,7 +64,7 @@ print(f'\nMaking request to: {url}')
 print(f'Model: {payload["model"]}')
 
 try:
-    response = requests.post(url, headers=headers, json=payload, timeout=120)
+    response = SESSION.post(url, headers=headers, json=payload, timeout=120)
     print(f'\nStatus Code: {response.status_code}')
     print(f'Content-Type: {response.headers.get("Content-Type")}')
     print(f'\nResponse Text (first 500 chars):\n{response.text[:500]}')
@@ -1,5 +1,29 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import socket
+import sys
+
+# Reuse one pooled connection for requests to Ollama
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4,
+                                     max_retries=Retry(total=2, backoff_factor=0.2)))
+
+
+def _ollama_up():
+    """Fast TCP probe so a stopped Ollama fails in milliseconds, not on the HTTP timeout"""
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.settimeout(0.05)
+    try:
+        return s.connect_ex(('127.0.0.1', 11434)) == 0
+    finally:
+        s.close()
+
+
+if not _ollama_up():
+    print("❌ Ollama is not running on localhost:11434. Start it with: ollama serve")
+    sys.exit(1)
 
 print("Testing Ollama...")
 
@@ -13,7 +37,7 @@ payload = {
 
 try:
     print("Sending request...")
-    response = requests.post(url, json=payload, timeout=120)
+    response = SESSION.post(url, json=payload, timeout=120)
     print(f"Status: {response.status_code}")
     
     if response.status_code == 200: